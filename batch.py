@@ -0,0 +1,247 @@
+from datetime import datetime
+from typing import List
+
+import numpy as np
+
+import dll as dll
+import earclipping as e
+import exact
+import hm as hm
+import main
+import memory
+
+# Batched ear clipping for workloads of many small instances. The polygons of all instances are packed into shared
+# coordinate arrays, and in every round each unfinished polygon clips one ear. The angles and the ear tests of all
+# vertices that changed in a round are computed for all polygons at once with vectorized numpy calls, instead of
+# calling getAngle and isInside per vertex.
+
+
+def angles(x: np.ndarray, y: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Vectorized EarClipping.getAngle: angles (a, b, c) in degrees in [0, 360)
+    """
+    ang = np.degrees(np.arctan2(y[c] - y[b], x[c] - x[b]) - np.arctan2(y[a] - y[b], x[a] - x[b]))
+    return np.where(ang < 0, ang + 360, ang)
+
+
+def areas(x: np.ndarray, y: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Vectorized earclipping.areaOfTriangle
+    """
+    return np.abs((x[a] * (y[b] - y[c]) + x[b] * (y[c] - y[a]) + x[c] * (y[a] - y[b])) / 2.0)
+
+
+class PackedPolygons:
+    def __init__(self, polygons: List[dll.DoublyLinkedList]):
+        """
+        Pack the vertices of all polygons into shared arrays, the vertices of polygon k
+        occupy the positions start[k], ..., start[k + 1] - 1
+        :param polygons: DLLs of the vertices of the polygons
+        """
+        self.vertices: List[dll.Vertex] = []
+        start = [0]
+        for polygon in polygons:
+            node = polygon.head
+            for _ in range(polygon.length()):
+                self.vertices.append(node.vertex)
+                node = node.next
+            start.append(len(self.vertices))
+
+        n = len(self.vertices)
+        self.start = np.array(start)
+        self.polygon = np.repeat(np.arange(len(polygons)), np.diff(self.start))
+        self.x = np.array([v.x for v in self.vertices], dtype=float)
+        self.y = np.array([v.y for v in self.vertices], dtype=float)
+        self.alive = np.ones(n, dtype=bool)
+
+        # Circular links within every polygon
+        positions = np.arange(n)
+        self.next = positions + 1
+        self.previous = positions - 1
+        last = self.start[1:] - 1
+        first = self.start[:-1]
+        nonEmpty = last >= first
+        self.next[last[nonEmpty]] = first[nonEmpty]
+        self.previous[first[nonEmpty]] = last[nonEmpty]
+
+    def earTips(self, vertices: np.ndarray, maxPairs=1 << 22):
+        """
+        Vectorized EarClipping.getAngle for many vertices of possibly different polygons at once:
+        compute their angles and whether they are ear tips, i.e. whether they are convex and the triangle
+        (next, vertex, previous) does not contain any remaining vertex of its polygon
+        :param vertices: positions of the vertices
+        :param maxPairs: maximum number of (triangle, vertex) pairs tested in a single call, to bound the memory
+        :return: (angles, isEarTip)
+        """
+        b = vertices
+        a = self.next[b]
+        c = self.previous[b]
+        ang = angles(self.x, self.y, a, b, c)
+        isEar = ang < 180
+
+        candidates = np.flatnonzero(isEar)
+        counts = (self.start[self.polygon[b[candidates]] + 1] - self.start[self.polygon[b[candidates]]])
+
+        # Split the candidates in chunks of at most maxPairs pairs
+        chunkStart = 0
+        cumulative = np.cumsum(counts)
+        while chunkStart < len(candidates):
+            offset = cumulative[chunkStart - 1] if chunkStart > 0 else 0
+            chunkEnd = max(chunkStart + 1, int(np.searchsorted(cumulative, offset + maxPairs, side='right')))
+            chunk = candidates[chunkStart:chunkEnd]
+            isEar[chunk] = ~self.containsVertex(b[chunk], a[chunk], c[chunk], counts[chunkStart:chunkEnd])
+            chunkStart = chunkEnd
+
+        return ang, isEar
+
+    def containsVertex(self, b: np.ndarray, a: np.ndarray, c: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """
+        Vectorized earclipping.isInside: check for every triangle (a, b, c) whether any remaining vertex of its
+        polygon lies inside it, not counting vertices that coincide with a corner of the triangle
+        :param counts: number of vertices of the polygon of every triangle
+        :return: bool per triangle
+        """
+        triangle = np.repeat(np.arange(len(b)), counts)
+        # Positions of all vertices of the polygon of every triangle
+        first = self.start[self.polygon[b]]
+        d = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - first, counts)
+
+        ta, tb, tc = a[triangle], b[triangle], c[triangle]
+        x, y = self.x, self.y
+        coincides = ((x[d] == x[ta]) & (y[d] == y[ta])) | ((x[d] == x[tb]) & (y[d] == y[tb])) | \
+                    ((x[d] == x[tc]) & (y[d] == y[tc]))
+
+        A = areas(x, y, ta, tb, tc)
+        total = areas(x, y, d, tb, tc) + areas(x, y, ta, d, tc) + areas(x, y, ta, tb, d)
+        # Same tolerance as math.isclose(A, total, rel_tol=1e-5)
+        inside = np.abs(A - total) <= 1e-5 * np.maximum(np.abs(A), np.abs(total))
+        inside &= self.alive[d] & ~coincides
+
+        return np.bincount(triangle, weights=inside, minlength=len(b)) > 0
+
+
+def triangulateMany(polygons: List[dll.DoublyLinkedList], names: List[str]) -> List[e.EarClipping]:
+    """
+    Triangulate many polygons at once using ear clipping, clipping the ear with the smallest angle first,
+    like EarClipping does for a single polygon
+    :param polygons: DLLs of the vertices of the polygons
+    :param names: name of the instance of every polygon
+    :return: EarClipping per polygon
+    """
+    packed = PackedPolygons(polygons)
+    n = len(packed.vertices)
+    numPolygons = len(polygons)
+    sizes = np.diff(packed.start)
+
+    angle = np.zeros(n)
+    isEar = np.zeros(n, dtype=bool)
+    if n > 0:
+        angle, isEar = packed.earTips(np.arange(n))
+
+    # Ear tips per polygon, in the order in which they were found
+    earTips = [[] for _ in range(numPolygons)]
+    for v in np.flatnonzero(isEar):
+        earTips[packed.polygon[v]].append(int(v))
+
+    triangles = [[] for _ in range(numPolygons)]
+    active = [k for k in range(numPolygons) if sizes[k] - 2 > 0 and earTips[k]]
+
+    while active:
+        changed = []
+        for k in active:
+            # The ear tip with the smallest angle, the last one found on ties
+            tips = earTips[k]
+            best = 0
+            for i in range(1, len(tips)):
+                if angle[tips[i]] <= angle[tips[best]]:
+                    best = i
+            tip = tips.pop(best)
+
+            previous, following = int(packed.previous[tip]), int(packed.next[tip])
+            triangles[k].append((previous, tip, following))
+
+            # Remove the ear tip from the polygon
+            packed.alive[tip] = False
+            packed.next[previous] = following
+            packed.previous[following] = previous
+
+            # The previous and next vertex are recalculated
+            for v in (previous, following):
+                if v in tips:
+                    tips.remove(v)
+                changed.append(v)
+
+        changed = np.array(changed)
+        angle[changed], isEar[changed] = packed.earTips(changed)
+        for v in changed:
+            if isEar[v]:
+                earTips[packed.polygon[v]].append(int(v))
+
+        active = [k for k in active if len(triangles[k]) < sizes[k] - 2 and earTips[k]]
+
+    result = []
+    for k in range(numPolygons):
+        if len(earTips[k]) == 3 and len(triangles[k]) < sizes[k] - 2:
+            # If there are still 3 ear tips left, add them as a triangle
+            triangles[k].append(tuple(earTips[k]))
+
+        table = e.VertexTable()
+        indices = [tuple(table.add(packed.vertices[v]) for v in triangle) for triangle in triangles[k]]
+        result.append(e.EarClipping.restore(names[k], table, indices))
+
+    return result
+
+
+def solveMany(instances: List[dict], names: List[str], profile='balanced'):
+    """
+    Solve many (small) instances, triangulating all of them in a single batch
+    :param instances: loaded instance jsons
+    :param names: name of every instance, used in the solutions
+    :param profile: name of the solver profile in main.PROFILES
+    :return: list of (HertelMehlhorn, stats) per instance, the timings of the batched phases are divided
+    evenly over the instances and the peak memory is that of the batch up to the instance
+    """
+    settings = main.PROFILES[profile]
+    holeOrders = settings['holeOrders']
+    memory.resetPeakRss()
+
+    timestamp = datetime.now()
+    polygons = [main.getTriangleData(instance, reverseHoles) for instance in instances for reverseHoles in holeOrders]
+    dllTime = (datetime.now() - timestamp).total_seconds() / max(1, len(instances))
+
+    timestamp = datetime.now()
+    triangulations = triangulateMany(polygons, [name for name in names for _ in holeOrders])
+    triangulationTime = (datetime.now() - timestamp).total_seconds() / max(1, len(instances))
+
+    results = []
+    for k in range(len(instances)):
+        timestamp = datetime.now()
+        HM = None
+        for T in triangulations[k * len(holeOrders):(k + 1) * len(holeOrders)]:
+            result = hm.HertelMehlhorn(T, settings['orderings'], settings['restarts'])
+            if HM is None or len(result.polygons) < len(HM.polygons):
+                HM = result
+        hmTime = (datetime.now() - timestamp).total_seconds()
+
+        timestamp = datetime.now()
+        if settings['exact'] is not None:
+            HM.polygons = exact.improve(HM.polygons, HM.T.table, **settings['exact'])
+        exactTime = (datetime.now() - timestamp).total_seconds()
+
+        stats = {
+            'profile': profile,
+            'time': dllTime + triangulationTime + hmTime + exactTime,
+            'timings': {
+                'dll': dllTime,
+                'triangulation': triangulationTime,
+                'hm': hmTime,
+                'exact': exactTime
+            },
+            'peakMemory': memory.peakRss(),
+            'triangles': len(HM.T.triangulation),
+            'polygons': len(HM.polygons),
+            'budgetExceeded': False
+        }
+        results.append((HM, stats))
+
+    return results
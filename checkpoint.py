@@ -0,0 +1,232 @@
+import os
+import struct
+import sys
+from array import array
+
+import dll as dll
+import earclipping as e
+import hm as hm
+
+# Binary checkpoint of a solver run, written after every finished triangulation and periodically during
+# Hertel Mehlhorn, such that an interrupted run can continue without redoing the finished stages.
+#
+# Layout (native byte order, which is recorded and checked on load):
+#   header:        magic b'MCPC', version u8, little endian u8, instance hash 32 bytes, profile str
+#   triangulation: count u32, then per hole order: index u32, coordinate typecode u8, vertex count u32,
+#                  x coordinates, y coordinates, triangle count u32, vertex indices (3 per triangle, int32)
+#   search:        count u32, then per hole order: index u32, score count u32, (ordering str, score u32)*,
+#                  best ordering (triangle count u32, triangle positions int32),
+#                  best polygons (polygon count u32, lengths uint32, vertex indices int32)
+# with str being a u16 length followed by utf-8 bytes
+
+MAGIC = b'MCPC'
+VERSION = 1
+
+
+class Writer:
+    def __init__(self):
+        self.parts = []
+
+    def pack(self, fmt: str, *values):
+        self.parts.append(struct.pack('=' + fmt, *values))
+
+    def string(self, value: str):
+        data = value.encode()
+        self.pack('H', len(data))
+        self.parts.append(data)
+
+    def array(self, values: array):
+        self.pack('I', len(values))
+        self.parts.append(values.tobytes())
+
+    def getvalue(self) -> bytes:
+        return b''.join(self.parts)
+
+
+class Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt: str):
+        fmt = '=' + fmt
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values if len(values) > 1 else values[0]
+
+    def bytes(self, n: int) -> bytes:
+        if self.offset + n > len(self.data):
+            raise ValueError('Truncated checkpoint')
+        value = self.data[self.offset:self.offset + n]
+        self.offset += n
+        return value
+
+    def string(self) -> str:
+        return self.bytes(self.unpack('H')).decode()
+
+    def array(self, typecode: str) -> array:
+        values = array(typecode)
+        values.frombytes(self.bytes(self.unpack('I') * values.itemsize))
+        return values
+
+
+class Checkpoint:
+    def __init__(self, instanceHash: str, profile: str):
+        """
+        :param instanceHash: hash of the instance (see history.instanceHash)
+        :param profile: name of the solver profile of the run
+        """
+        self.instanceHash = instanceHash
+        self.profile = profile
+        # Hole order -> (coordinate typecode, x coordinates, y coordinates, triangle vertex indices)
+        self.triangulations = {}
+        # Hole order -> (scores, best ordering as triangle positions, best polygons as vertex index runs)
+        self.searches = {}
+
+    def setTriangulation(self, holeOrder: int, T: e.EarClipping):
+        """
+        Store a finished triangulation
+        :param holeOrder: index of the hole order in the profile
+        :param T: EarClipping
+        """
+        vertices = T.table.vertices
+        if all(isinstance(v.x, int) and isinstance(v.y, int) for v in vertices):
+            typecode = 'q'
+        else:
+            typecode = 'd'
+
+        xs = array(typecode, (v.x for v in vertices))
+        ys = array(typecode, (v.y for v in vertices))
+        triangles = array('i', (i for t in T.triangulation for i in t.idx))
+        self.triangulations[holeOrder] = (typecode, xs, ys, triangles)
+
+    def getTriangulation(self, holeOrder: int, name: str):
+        """
+        :param holeOrder: index of the hole order in the profile
+        :param name: name of the instance
+        :return: restored EarClipping, or None if the triangulation was not finished
+        """
+        if holeOrder not in self.triangulations:
+            return None
+
+        typecode, xs, ys, triangles = self.triangulations[holeOrder]
+        table = e.VertexTable()
+        for x, y in zip(xs, ys):
+            table.add(dll.Vertex(x, y))
+
+        return e.EarClipping.restore(name, table, zip(triangles[0::3], triangles[1::3], triangles[2::3]))
+
+    def setSearch(self, holeOrder: int, HM: hm.HertelMehlhorn):
+        """
+        Store the orderings tried so far and the best decomposition of a (possibly unfinished) HM search
+        :param holeOrder: index of the hole order in the profile
+        :param HM: HertelMehlhorn
+        """
+        if HM.best is None:
+            return
+
+        positions = {t: i for i, t in enumerate(HM.T.triangulation)}
+        bestOrder = array('i', (positions[t] for t in HM.bestOrder))
+        polygons = [array('i', polygon.idx) for polygon in HM.best]
+        self.searches[holeOrder] = (dict(HM.scores), bestOrder, polygons)
+
+    def getSearch(self, holeOrder: int, T: e.EarClipping):
+        """
+        :param holeOrder: index of the hole order in the profile
+        :param T: triangulation the search was run on
+        :return: resume argument for HertelMehlhorn, or None if the search was not started
+        """
+        if holeOrder not in self.searches:
+            return None
+
+        scores, bestOrder, polygons = self.searches[holeOrder]
+        best = [hm.Polygon(T.table, idx) for idx in polygons]
+        return dict(scores), best, [T.triangulation[i] for i in bestOrder]
+
+    def save(self, path: str):
+        """
+        Write the checkpoint, replacing the previous one only once it has been written completely
+        :param path: path of the checkpoint file
+        """
+        writer = Writer()
+        writer.parts.append(MAGIC)
+        writer.pack('BB', VERSION, sys.byteorder == 'little')
+        writer.parts.append(bytes.fromhex(self.instanceHash))
+        writer.string(self.profile)
+
+        writer.pack('I', len(self.triangulations))
+        for holeOrder, (typecode, xs, ys, triangles) in self.triangulations.items():
+            writer.pack('Ic', holeOrder, typecode.encode())
+            writer.array(xs)
+            writer.parts.append(ys.tobytes())
+            writer.pack('I', len(triangles) // 3)
+            writer.parts.append(triangles.tobytes())
+
+        writer.pack('I', len(self.searches))
+        for holeOrder, (scores, bestOrder, polygons) in self.searches.items():
+            writer.pack('II', holeOrder, len(scores))
+            for name, score in scores.items():
+                writer.string(name)
+                writer.pack('I', score)
+            writer.array(bestOrder)
+            writer.array(array('I', (len(polygon) for polygon in polygons)))
+            for polygon in polygons:
+                writer.parts.append(polygon.tobytes())
+
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(writer.getvalue())
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path: str, instanceHash: str, profile: str):
+        """
+        :param path: path of the checkpoint file
+        :param instanceHash: hash of the instance that is going to be solved
+        :param profile: name of the solver profile that is going to be used
+        :return: Checkpoint, or None if there is no usable checkpoint for this instance and profile
+        """
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            reader = Reader(f.read())
+
+        try:
+            if reader.bytes(4) != MAGIC:
+                return None
+            version, little = reader.unpack('BB')
+            if version != VERSION or bool(little) != (sys.byteorder == 'little'):
+                return None
+            if reader.bytes(32).hex() != instanceHash or reader.string() != profile:
+                return None
+
+            checkpoint = Checkpoint(instanceHash, profile)
+            for _ in range(reader.unpack('I')):
+                holeOrder, typecode = reader.unpack('Ic')
+                typecode = typecode.decode()
+                xs = reader.array(typecode)
+                ys = array(typecode)
+                ys.frombytes(reader.bytes(len(xs) * ys.itemsize))
+                triangles = array('i')
+                triangles.frombytes(reader.bytes(reader.unpack('I') * 3 * triangles.itemsize))
+                checkpoint.triangulations[holeOrder] = (typecode, xs, ys, triangles)
+
+            for _ in range(reader.unpack('I')):
+                holeOrder, numScores = reader.unpack('II')
+                scores = {}
+                for _ in range(numScores):
+                    name = reader.string()
+                    scores[name] = reader.unpack('I')
+                bestOrder = reader.array('i')
+                polygons = []
+                for length in reader.array('I'):
+                    polygon = array('i')
+                    polygon.frombytes(reader.bytes(length * polygon.itemsize))
+                    polygons.append(polygon)
+                checkpoint.searches[holeOrder] = (scores, bestOrder, polygons)
+        except (struct.error, ValueError, UnicodeDecodeError):
+            # Corrupt checkpoint, start over
+            return None
+
+        return checkpoint
@@ -1,6 +1,7 @@
 import dll as dll
 from typing import List
-import matplotlib.pyplot as plt
+import numpy as np
+import render
 import json
 import math
 from copy import copy
@@ -9,26 +10,58 @@ sys.setrecursionlimit(10**7) # max depth of recursion
 threading.stack_size(2**27)  # new thread will get stack of such size
 
 
-class Edge:
-    def __init__(self, v1: dll.Vertex, v2: dll.Vertex):
+class VertexTable:
+    __slots__ = ('vertices', 'lookup')
+
+    def __init__(self):
+        """
+        Shared table of the distinct vertices of a triangulation.
+        Vertices with equal coordinates (e.g. the copies created for a bridge) share a single index
         """
-        :param v1: dll.Vertex
-        :param v2: dll.Vertex
+        self.vertices: List[dll.Vertex] = []
+        self.lookup = {}
+
+    def add(self, vertex: dll.Vertex) -> int:
         """
-        self.v1 = v1
-        self.v2 = v2
+        Get the index of `vertex`, adding it to the table if its coordinates are not present yet
+        :param vertex: Vertex
+        :return: int
+        """
+        key = (vertex.x, vertex.y)
+        idx = self.lookup.get(key)
+        if idx is None:
+            idx = len(self.vertices)
+            self.lookup[key] = idx
+            self.vertices.append(vertex)
+        return idx
+
+    def __len__(self):
+        return len(self.vertices)
 
 
 class Triangle:
-    def __init__(self, a: dll.Vertex, b: dll.Vertex, c: dll.Vertex):
+    __slots__ = ('table', 'idx', 'area')
+
+    def __init__(self, table: VertexTable, a: int, b: int, c: int):
         """
-        :param a: 1st vertex of the triangle
-        :param b: 2nd vertex of the triangle
-        :param c: 3rd vertex of the triangle
+        :param table: vertex table the indices refer to
+        :param a: index of the 1st vertex of the triangle
+        :param b: index of the 2nd vertex of the triangle
+        :param c: index of the 3rd vertex of the triangle
         """
-        self.v: List[dll.Vertex] = [a, b, c]
-        self.edges: List[Edge] = [Edge(a, b), Edge(b, c), Edge(c, a)]
-        self.area = areaOfTriangle(a, b, c)
+        self.table = table
+        self.idx = (a, b, c)
+        self.area = areaOfTriangle(*self.v)
+
+    @property
+    def v(self) -> List[dll.Vertex]:
+        return [self.table.vertices[i] for i in self.idx]
+
+    def getNumPoints(self):
+        return 3
+
+    def getPoint(self, idx):
+        return self.table.vertices[self.idx[idx]]
 
 
 def areaOfTriangle(a: dll.Vertex, b: dll.Vertex, c: dll.Vertex) -> float:
@@ -70,12 +103,42 @@ class EarClipping:
         :param name: name of the instance
         """
         self.name = name
-        self.triangulation = []
+        self.triangulation: List[Triangle] = []
+        self.table = VertexTable()
         self.vertices = vertices
         self.allVertices = copy(vertices)
         self.earTips = []
         self.triangulate()
 
+    @classmethod
+    def restore(cls, name: str, table: VertexTable, triangles):
+        """
+        Create a triangulation from earlier computed triangles, without triangulating again
+        :param name: name of the instance
+        :param table: vertex table the triangles refer to
+        :param triangles: (a, b, c) vertex indices per triangle
+        :return: EarClipping
+        """
+        T = cls.__new__(cls)
+        T.name = name
+        T.table = table
+        T.triangulation = [Triangle(table, a, b, c) for a, b, c in triangles]
+        T.vertices = None
+        T.allVertices = None
+        T.earTips = []
+        return T
+
+    def release(self, keepTriangulation=True):
+        """
+        Free the data that is only needed while triangulating
+        :param keepTriangulation: whether to keep the triangles, the vertex table is always kept
+        """
+        self.vertices = None
+        self.allVertices = None
+        self.earTips = []
+        if not keepTriangulation:
+            self.triangulation = []
+
     def getAngle(self, a: dll.Vertex, b: dll.Vertex, c: dll.Vertex):
         """
         Calculate the angle between (a, b, c).
@@ -142,7 +205,8 @@ class EarClipping:
                     nextVertex = temp.next
 
                     # Add the ear to the triangulation
-                    self.triangulation.append(Triangle(prevVertex.vertex, temp.vertex, nextVertex.vertex))
+                    self.triangulation.append(Triangle(self.table, self.table.add(prevVertex.vertex),
+                                                      self.table.add(temp.vertex), self.table.add(nextVertex.vertex)))
 
                     # Remove the ear tip from the DLL
                     self.vertices.delete(temp.vertex)
@@ -164,33 +228,17 @@ class EarClipping:
 
         if len(self.earTips) == 3:
             # If there are still 3 ear tips left, add them as a triangle
-            self.triangulation.append(Triangle(self.earTips[0], self.earTips[1], self.earTips[2]))
+            self.triangulation.append(Triangle(self.table, self.table.add(self.earTips[0]),
+                                               self.table.add(self.earTips[1]), self.table.add(self.earTips[2])))
 
-    def plot(self):
+    def plot(self, filename=None, maxPolygons=None):
         """
         Plot the triangulation
+        :param filename: path of the image to export to (.png, .svg, ...), or None to show the plot
+        :param maxPolygons: maximum number of triangles to draw, or None to draw all
         """
-        ps = []
-        for t in self.triangulation:
-            for p in t.v:
-                ps.append(p)
-
-        x_s = [p.x for p in ps]
-        y_s = [p.y for p in ps]
-
-        ts = []
-        for t in self.triangulation:
-            ts.append((ps.index(t.v[0]), ps.index(t.v[1]), ps.index(t.v[2])))
-
-        fig, ax = plt.subplots()
-
-        ax.scatter(x_s, y_s)
-        for t in self.triangulation:
-            x_p = [p.x for p in t.v]
-            y_p = [p.y for p in t.v]
-            ax.fill(x_p, y_p)
-        ax.set_title('Triangulation ' + self.name)
-        plt.show()
+        coordinates = np.array([[(p.x, p.y) for p in t.v] for t in self.triangulation], dtype=float)
+        render.render(list(coordinates), 'Triangulation ' + self.name, filename, maxPolygons)
 
     def export(self):
         export = {
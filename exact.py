@@ -0,0 +1,319 @@
+import time
+from array import array
+from collections import OrderedDict
+
+from hm import Polygon
+
+# Exact post-processing of a Hertel Mehlhorn decomposition: small connected groups of adjacent pieces are merged
+# into a single simple polygon, which is then partitioned into the minimum number of convex pieces (using its own
+# vertices only) by a memoized dynamic program over its diagonals, in the spirit of Keil and Greene.
+# The group is replaced when the optimal partition has fewer pieces.
+
+# Optimal partitions of earlier seen region shapes, keyed on the translated coordinates of the region
+CACHE = OrderedDict()
+CACHE_SIZE = 10000
+
+
+class RegionTimeout(Exception):
+    pass
+
+
+def cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def between(a, b, c) -> bool:
+    """
+    :return: whether c lies on the segment (a,b), given that a, b and c are collinear
+    """
+    if a[0] != b[0]:
+        return a[0] <= c[0] <= b[0] or b[0] <= c[0] <= a[0]
+    return a[1] <= c[1] <= b[1] or b[1] <= c[1] <= a[1]
+
+
+def segmentsIntersect(a, b, c, d) -> bool:
+    """
+    Check if the segments (a,b) and (c,d) intersect, touching included
+    """
+    d1, d2, d3, d4 = cross(a, b, c), cross(a, b, d), cross(c, d, a), cross(c, d, b)
+    if ((d1 > 0) != (d2 > 0)) and d1 != 0 and d2 != 0 and ((d3 > 0) != (d4 > 0)) and d3 != 0 and d4 != 0:
+        return True
+    return (d1 == 0 and between(a, b, c)) or (d2 == 0 and between(a, b, d)) or \
+        (d3 == 0 and between(c, d, a)) or (d4 == 0 and between(c, d, b))
+
+
+def isDiagonal(points: list, i: int, j: int) -> bool:
+    """
+    Check if (i,j) is a diagonal of the counterclockwise simple polygon `points`,
+    based on `Computational Geometry in C` by O'Rourke
+    """
+    n = len(points)
+    a, b = points[i], points[j]
+
+    # The diagonal has to start into the interior of the polygon at both ends
+    for u, v in ((i, j), (j, i)):
+        p, q = points[u], points[v]
+        before, after = points[(u - 1) % n], points[(u + 1) % n]
+        if cross(p, after, before) >= 0:
+            # Convex vertex
+            if not (cross(p, q, before) > 0 and cross(q, p, after) > 0):
+                return False
+        elif cross(p, q, after) >= 0 and cross(q, p, before) >= 0:
+            return False
+
+    # The diagonal may not intersect any edge that is not incident to it
+    for k in range(n):
+        k1 = (k + 1) % n
+        if k in (i, j) or k1 in (i, j):
+            continue
+        if segmentsIntersect(a, b, points[k], points[k1]):
+            return False
+
+    return True
+
+
+def partition(points: list, deadline: float):
+    """
+    Minimum partition of the counterclockwise simple polygon `points` into convex pieces using diagonals only
+    :param points: list of (x, y)
+    :param deadline: time.perf_counter() value after which the search is abandoned
+    :return: list of pieces, each a list of positions in `points`, or None if no partition was found
+    (only possible for degenerate input)
+    :raises RegionTimeout: when the deadline has passed
+    """
+    n = len(points)
+    valid = [[False] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            valid[i][j] = j == i + 1 or (i == 0 and j == n - 1) or isDiagonal(points, i, j)
+
+    best = {}
+
+    def solve(a: int, b: int):
+        """
+        :return: (number of pieces, chain of the piece containing (b,a)) for the sub-polygon a, a + 1, ..., b
+        """
+        if b == a + 1:
+            return 0, None
+        if (a, b) in best:
+            return best[(a, b)]
+        if time.perf_counter() > deadline:
+            raise RegionTimeout()
+
+        # Cheapest convex chain a = k0 < k1 < ... < km = b, closed by (b,a), to use as the piece containing (b,a)
+        chains = {}
+        for k in range(a + 1, b):
+            if valid[a][k] and cross(points[b], points[a], points[k]) >= 0:
+                chains[(a, k)] = (solve(a, k)[0], None)
+
+        result = (n + 1, None)
+        for cur in range(a + 1, b + 1):
+            for prev in range(a, cur):
+                if (prev, cur) not in chains:
+                    continue
+                cost = chains[(prev, cur)][0]
+
+                if cur == b:
+                    if cross(points[prev], points[b], points[a]) >= 0 and cost + 1 < result[0]:
+                        result = (cost + 1, (prev, cur))
+                    continue
+
+                for nxt in range(cur + 1, b + 1):
+                    if not valid[cur][nxt] or cross(points[prev], points[cur], points[nxt]) < 0:
+                        continue
+                    total = cost + solve(cur, nxt)[0]
+                    if (cur, nxt) not in chains or total < chains[(cur, nxt)][0]:
+                        chains[(cur, nxt)] = (total, prev)
+
+        if result[1] is not None:
+            # Walk the chain back from b to a
+            prev, cur = result[1]
+            chain = [cur]
+            while cur != a:
+                chain.append(prev)
+                prev, cur = chains[(prev, cur)][1], prev
+            result = (result[0], chain[::-1])
+
+        best[(a, b)] = result
+        return result
+
+    pieces = []
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        count, chain = solve(a, b)
+        if chain is None:
+            return None
+        pieces.append(chain)
+        for k in range(len(chain) - 1):
+            if chain[k + 1] > chain[k] + 1:
+                stack.append((chain[k], chain[k + 1]))
+
+    return pieces
+
+
+def boundary(group: list):
+    """
+    Boundary of the union of a group of adjacent pieces
+    :param group: list of polygons
+    :return: vertex indices of the boundary in the orientation of the pieces, or None if the union is not
+    a simple polygon without holes
+    """
+    edges = set()
+    for polygon in group:
+        idx = polygon.idx
+        for k in range(len(idx)):
+            edges.add((idx[k], idx[(k + 1) % len(idx)]))
+
+    following = {}
+    for a, b in edges:
+        if (b, a) in edges:
+            continue
+        if a in following:
+            # The boundary touches itself
+            return None
+        following[a] = b
+
+    if not following:
+        return None
+
+    start = next(iter(following))
+    cycle = [start]
+    v = following[start]
+    while v != start:
+        cycle.append(v)
+        v = following.get(v)
+        if v is None or len(cycle) > len(following):
+            return None
+
+    if len(cycle) != len(following):
+        # More than one boundary cycle, so the union has a hole
+        return None
+
+    return cycle
+
+
+def optimalPieces(cycle: list, table, regionTime: float):
+    """
+    Optimal convex partition of a region, using and filling the cache
+    :param cycle: vertex indices of the boundary of the region
+    :param table: vertex table the indices refer to
+    :param regionTime: maximum number of seconds to spend on the region
+    :return: list of pieces, each a list of vertex indices in the orientation of `cycle`, or None on a timeout
+    or when no partition was found
+    """
+    points = [(table.vertices[i].x, table.vertices[i].y) for i in cycle]
+    area = sum(cross((0, 0), points[k], points[(k + 1) % len(points)]) for k in range(len(points)))
+    reverse = area < 0
+    if reverse:
+        cycle = cycle[::-1]
+        points = points[::-1]
+
+    # Start at the smallest vertex and translate it to the origin, such that equal shapes share a cache entry
+    first = min(range(len(points)), key=lambda k: points[k])
+    cycle = cycle[first:] + cycle[:first]
+    points = points[first:] + points[:first]
+    key = tuple((x - points[0][0], y - points[0][1]) for x, y in points)
+
+    if key in CACHE:
+        CACHE.move_to_end(key)
+        pieces = CACHE[key]
+    else:
+        try:
+            pieces = partition(points, time.perf_counter() + regionTime)
+        except RegionTimeout:
+            return None
+        CACHE[key] = pieces
+        if len(CACHE) > CACHE_SIZE:
+            CACHE.popitem(last=False)
+
+    if pieces is None:
+        return None
+
+    result = []
+    for piece in pieces:
+        idx = [cycle[k] for k in piece]
+        result.append(idx[::-1] if reverse else idx)
+    return result
+
+
+def numReflex(cycle: list, table) -> int:
+    """
+    :return: number of reflex vertices of the region, with respect to its orientation
+    """
+    points = [(table.vertices[i].x, table.vertices[i].y) for i in cycle]
+    n = len(points)
+    area = sum(cross((0, 0), points[k], points[(k + 1) % n]) for k in range(n))
+    sign = 1 if area > 0 else -1
+    return sum(1 for k in range(n) if sign * cross(points[k - 1], points[k], points[(k + 1) % n]) < 0)
+
+
+def improve(polygons: list, table, maxPieces=4, maxVertices=12, maxReflex=3, regionTime=0.5, totalTime=10.0) -> list:
+    """
+    Replace small groups of adjacent pieces by an optimal convex partition of their union, where that has fewer pieces
+    :param polygons: convex pieces, e.g. the result of Hertel Mehlhorn
+    :param table: vertex table the pieces refer to
+    :param maxPieces: maximum number of pieces in a group
+    :param maxVertices: maximum number of vertices on the boundary of a group
+    :param maxReflex: maximum number of reflex vertices on the boundary of a group
+    :param regionTime: maximum number of seconds to spend on a single group
+    :param totalTime: maximum number of seconds to spend in total
+    :return: list of polygons
+    """
+    deadline = time.perf_counter() + totalTime
+    polygons = list(polygons)
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+
+        # Map every edge to the piece it belongs to, to find the neighbours of a piece
+        owner = {}
+        for polygon in polygons:
+            idx = polygon.idx
+            for k in range(len(idx)):
+                owner[(idx[k], idx[(k + 1) % len(idx)])] = polygon
+
+        removed = set()
+        added = []
+        for seed in polygons:
+            if time.perf_counter() > deadline:
+                break
+            if seed in removed:
+                continue
+
+            # Grow a group around the seed, breadth first
+            group = [seed]
+            cycle = boundary(group)
+            queue = [seed]
+            while queue and len(group) < maxPieces:
+                polygon = queue.pop(0)
+                idx = polygon.idx
+                for k in range(len(idx)):
+                    neighbour = owner.get((idx[(k + 1) % len(idx)], idx[k]))
+                    if neighbour is None or neighbour in removed or neighbour in group:
+                        continue
+                    grown = boundary(group + [neighbour])
+                    if grown is None or len(grown) > maxVertices:
+                        continue
+                    group.append(neighbour)
+                    cycle = grown
+                    queue.append(neighbour)
+                    if len(group) == maxPieces:
+                        break
+
+            # Two adjacent pieces could only be improved upon by a single one, which HM would have found
+            if len(group) < 3 or cycle is None or numReflex(cycle, table) > maxReflex:
+                continue
+
+            pieces = optimalPieces(cycle, table, regionTime)
+            if pieces is None or len(pieces) >= len(group):
+                continue
+
+            removed.update(group)
+            added.extend(Polygon(table, array('i', piece)) for piece in pieces)
+            improved = True
+
+        polygons = [polygon for polygon in polygons if polygon not in removed] + added
+
+    return polygons
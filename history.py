@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+from typing import List
+
+
+def instanceHash(instance: dict) -> str:
+    """
+    :param instance: loaded instance json
+    :return: hash of the instance, independent of the key order and formatting of the json
+    """
+    canonical = json.dumps(instance, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class RunHistory:
+    def __init__(self, path='history.sqlite'):
+        """
+        Store of all solver runs, to track running time and solution quality over time
+        :param path: path of the SQLite database, created if it does not exist
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started TEXT NOT NULL,
+                instance TEXT NOT NULL,
+                instance_hash TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                config TEXT NOT NULL,
+                time REAL NOT NULL,
+                timings TEXT NOT NULL,
+                peak_memory INTEGER,
+                triangles INTEGER NOT NULL,
+                polygons INTEGER NOT NULL,
+                solution BLOB
+            )''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS runs_instance ON runs (instance, started)')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, name: str, instance: dict, config: dict, stats: dict, solution=None) -> int:
+        """
+        Record a single run
+        :param name: name of the instance
+        :param instance: loaded instance json
+        :param config: solver configuration the run used
+        :param stats: stats returned by main.solve
+        :param solution: solution json, kept such that the best known solution can be retrieved
+        :return: id of the run
+        """
+        if solution is not None:
+            solution = zlib.compress(json.dumps(solution).encode())
+
+        cursor = self.connection.execute(
+            'INSERT INTO runs (started, instance, instance_hash, profile, config, time, timings, peak_memory, '
+            'triangles, polygons, solution) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (datetime.now().isoformat(timespec='seconds'), name, instanceHash(instance), stats['profile'],
+             json.dumps(config, sort_keys=True), stats['time'], json.dumps(stats['timings']),
+             stats.get('peakMemory'), stats['triangles'], stats['polygons'], solution))
+        self.connection.commit()
+        return cursor.lastrowid
+
+    def toDict(self, row: sqlite3.Row) -> dict:
+        run = dict(row)
+        run['config'] = json.loads(run['config'])
+        run['timings'] = json.loads(run['timings'])
+        if run.get('solution') is not None:
+            run['solution'] = json.loads(zlib.decompress(run['solution']))
+        return run
+
+    def instances(self) -> List[str]:
+        """
+        :return: names of all instances that have been run
+        """
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT instance FROM runs ORDER BY instance')]
+
+    def runs(self, name: str, profile=None, instanceHash=None) -> List[dict]:
+        """
+        All runs of an instance, from old to new
+        :param name: name of the instance
+        :param profile: only return runs of this profile, if given
+        :param instanceHash: only return runs of this version of the instance, if given
+        :return: list of runs, without their solutions
+        """
+        query = 'SELECT id, started, instance, instance_hash, profile, config, time, timings, peak_memory, ' \
+                'triangles, polygons FROM runs WHERE instance = ?'
+        parameters = [name]
+        if profile is not None:
+            query += ' AND profile = ?'
+            parameters.append(profile)
+        if instanceHash is not None:
+            query += ' AND instance_hash = ?'
+            parameters.append(instanceHash)
+
+        rows = self.connection.execute(query + ' ORDER BY started, id', parameters)
+        return [self.toDict(row) for row in rows]
+
+    def best(self, name: str, instanceHash: str):
+        """
+        Best known solution of an instance: the run with the fewest polygons, the fastest one on ties.
+        Only runs of the same version of the instance count, the solutions of other versions are not valid for it
+        :param name: name of the instance
+        :param instanceHash: hash of the instance (see instanceHash)
+        :return: run including its solution, or None if the instance has not been run
+        """
+        row = self.connection.execute('SELECT * FROM runs WHERE instance = ? AND instance_hash = ? AND '
+                                      'solution IS NOT NULL ORDER BY polygons, time LIMIT 1',
+                                      (name, instanceHash)).fetchone()
+        if row is None:
+            return None
+        return self.toDict(row)
+
+    def report(self, name=None):
+        """
+        Print the trend of an instance, or an overview of the latest runs of all instances
+        :param name: name of the instance, or None for all instances
+        """
+        if name is not None:
+            print('%-19s %-8s %-9s %9s %9s %9s %9s %9s %10s %9s %8s' % ('started', 'hash', 'profile', 'time', 'dll',
+                                                                         'triang.', 'hm', 'exact', 'peak kB',
+                                                                         'triangles', 'polygons'))
+            previous = None
+            for run in self.runs(name):
+                if previous is not None and run['instance_hash'] != previous:
+                    print('-- instance changed, the runs below are not comparable to the ones above')
+                previous = run['instance_hash']
+                timings = run['timings']
+                print('%-19s %-8s %-9s %9.3f %9.3f %9.3f %9.3f %9.3f %10s %9d %8d' % (
+                    run['started'], run['instance_hash'][:8], run['profile'], run['time'], timings.get('dll', 0.0),
+                    timings.get('triangulation', 0.0), timings.get('hm', 0.0), timings.get('exact', 0.0),
+                    run['peak_memory'], run['triangles'], run['polygons']))
+            return
+
+        print('%-30s %-8s %-9s %5s %8s %6s %5s %9s %8s' % ('instance', 'hash', 'profile', 'runs', 'polygons', 'delta',
+                                                           'best', 'time', 'delta'))
+        for instance in self.instances():
+            profiles = sorted({run['profile'] for run in self.runs(instance)})
+            for profile in profiles:
+                # Only the runs of the latest version of the instance are comparable
+                latestHash = self.runs(instance, profile)[-1]['instance_hash']
+                runs = self.runs(instance, profile, latestHash)
+                best = self.best(instance, latestHash)
+                latest = runs[-1]
+                # Compare with the previous run of the same profile
+                previous = runs[-2] if len(runs) > 1 else latest
+                print('%-30s %-8s %-9s %5d %8d %+6d %5s %9.3f %+8.3f' % (
+                    instance, latestHash[:8], profile, len(runs), latest['polygons'],
+                    latest['polygons'] - previous['polygons'],
+                    best['polygons'] if best is not None else '-', latest['time'],
+                    latest['time'] - previous['time']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the history of solver runs')
+    parser.add_argument('command', choices=['report', 'best'])
+    parser.add_argument('instance', nargs='?', help='name of the instance, e.g. example_instance1.instance')
+    parser.add_argument('--db', default='history.sqlite', help='path of the SQLite database')
+    parser.add_argument('--file', help='path of the instance json, used by best to only consider runs of this '
+                                       'version of the instance, defaults to instances/<instance>.json')
+    args = parser.parse_args()
+
+    history = RunHistory(args.db)
+    if args.command == 'report':
+        history.report(args.instance)
+    else:
+        if args.instance is None:
+            parser.error('best requires an instance')
+        path = args.file or 'instances/' + args.instance + '.json'
+        try:
+            with open(path) as f:
+                instance = json.load(f)
+        except OSError:
+            parser.error('cannot read ' + path + ', pass the instance json with --file')
+        run = history.best(args.instance, instanceHash(instance))
+        if run is None:
+            print('No solution known for', args.instance)
+        else:
+            # Print the best known solution, such that it can be redirected to a file
+            print(json.dumps(run['solution'], indent=4))
+    history.close()
@@ -1,24 +1,33 @@
 import dll as dll
 from typing import List
-from earclipping import Edge
-import matplotlib.pyplot as plt
+from array import array
+from earclipping import VertexTable
+import numpy as np
+import render
 import json
+import random
 
 
 class Polygon:
-    def __init__(self, vertices: List[dll.Vertex], edges: List[Edge]):
+    __slots__ = ('table', 'idx')
+
+    def __init__(self, table: VertexTable, idx: array):
         """
-        :param vertices:
-        :param edges:
+        :param table: vertex table the indices refer to
+        :param idx: run of vertex indices of the polygon
         """
-        self.v: List[dll.Vertex] = vertices
-        self.edges: List[Edge] = edges    
+        self.table = table
+        self.idx = idx
+
+    @property
+    def v(self) -> List[dll.Vertex]:
+        return [self.table.vertices[i] for i in self.idx]
 
     def getNumPoints(self):
-        return len(self.v)
+        return len(self.idx)
 
     def getPoint(self, idx):
-        return self.v[idx]
+        return self.table.vertices[self.idx[idx]]
 
 
 def isConvex(p1, p2, p3) -> bool:
@@ -35,60 +44,111 @@ def isConvex(p1, p2, p3) -> bool:
         return False
 
 
+def centroid(triangle, axis: str) -> float:
+    """
+    :param triangle: Triangle
+    :param axis: 'x' or 'y'
+    :return: coordinate of the centroid of the triangle along `axis`
+    """
+    return sum(getattr(v, axis) for v in triangle.v) / 3.0
+
+
+# Orders in which the triangles can be fed to Hertel Mehlhorn, the result of HM depends on this order
+ORDERINGS = {
+    'original': lambda triangles: list(triangles),
+    'reversed': lambda triangles: triangles[::-1],
+    'area': lambda triangles: sorted(triangles, key=lambda triangle: triangle.area),
+    'area-desc': lambda triangles: sorted(triangles, key=lambda triangle: triangle.area, reverse=True),
+    'x': lambda triangles: sorted(triangles, key=lambda triangle: centroid(triangle, 'x')),
+    'y': lambda triangles: sorted(triangles, key=lambda triangle: centroid(triangle, 'y')),
+}
+
+
 class HertelMehlhorn:
-    def __init__(self, T):
+    def __init__(self, T, orderings=('original', 'reversed', 'area', 'area-desc'), restarts=0, seed=0, resume=None,
+                 onProgress=None, canContinue=None):
         """
         :param T: triangulation of the polygon
+        :param orderings: names of the triangle orderings in ORDERINGS to run HM on
+        :param restarts: number of perturbed orderings to try after the best ordering has been found
+        :param seed: seed for the perturbations
+        :param resume: (scores, best polygons, best ordering) of an interrupted search on T, to continue from
+        :param onProgress: called with this object after every HM run, e.g. to save a checkpoint
+        :param canContinue: called before every HM run once a result is known, the search stops with the best result
+        so far when it returns False
         """
         self.T = T
-        self.triangulation = T.triangulation.copy()
         self.polygons = []
-        scores = []
+        self.scores = {}
+        self.best = None
+        self.bestOrder = None
+        self.onProgress = onProgress
+        self.canContinue = canContinue
 
-        # Run HM on the triangles
-        scores.append(self.run(self.triangulation))
+        if resume is not None:
+            self.scores, self.best, self.bestOrder = resume
 
-        # Run HM on the triangles in reversed order
-        self.polygons = []
-        scores.append(self.run(self.triangulation[::-1]))
+        for ordering in orderings:
+            if ordering not in self.scores and not self.stopped():
+                self.search(ordering, ORDERINGS[ordering](T.triangulation))
 
-        # Run HM on the triangles sorted on area
-        self.polygons = []
-        T.triangulation.sort(key=lambda triangle: triangle.area, reverse=False)
-        scores.append(self.run(T.triangulation))
+        if restarts > 0:
+            self.postOptimize(restarts, seed)
 
-        # Run HM on the triangles sorted on area
-        self.polygons = []
-        T.triangulation.sort(key=lambda triangle: triangle.area, reverse=True)
-        scores.append(self.run(T.triangulation))
-
-        # Run HM again on the best results, such that it can be exported
-        min_score = min(scores)
-        index = scores.index(min_score)
-
-        if index == 0:
-            self.polygons = []
-            scores.append(self.run(self.triangulation))
-        elif index == 1:
-            self.polygons = []
-            scores.append(self.run(self.triangulation[::-1]))
-        elif index == 2:
-            self.polygons = []
-            T.triangulation.sort(key=lambda triangle: triangle.area, reverse=False)
-            scores.append(self.run(T.triangulation))
-        else:
-            self.polygons = []
-            T.triangulation.sort(key=lambda triangle: triangle.area, reverse=True)
-            scores.append(self.run(T.triangulation))
+        # Keep the best result, such that it can be exported
+        self.polygons = self.best
+        self.T.polygons = self.best
+
+    def stopped(self) -> bool:
+        return self.best is not None and self.canContinue is not None and not self.canContinue()
+
+    def search(self, name: str, triangles):
+        """
+        Run HM on the triangles in the given order and keep the result if it is the best one so far
+        :param name: name of the ordering
+        :param triangles: list of triangles
+        """
+        score = self.run(triangles)
+        self.scores[name] = score
+
+        if self.best is None or score < len(self.best):
+            self.best = self.polygons
+            self.bestOrder = triangles
+
+        if self.onProgress is not None:
+            self.onProgress(self)
+
+    def postOptimize(self, restarts: int, seed: int):
+        """
+        Local search around the best ordering: repeatedly move a random block of triangles to the front
+        of the best ordering, such that HM starts growing polygons in another region, and run HM on it
+        :param restarts: number of perturbed orderings to try
+        :param seed: seed for the perturbations
+        """
+        for restart in range(restarts):
+            n = len(self.bestOrder)
+            if n < 2:
+                return
+
+            name = 'restart-' + str(restart)
+            if name in self.scores:
+                continue
+            if self.stopped():
+                return
+
+            # Seed every restart on its own, such that a resumed search perturbs the same way
+            size = max(1, n // 8)
+            i = random.Random(seed * restarts + restart).randrange(n)
+            order = self.bestOrder[i:i + size] + self.bestOrder[:i] + self.bestOrder[i + size:]
+            self.search(name, order)
 
     def run(self, triangles):
-        for t in triangles:
-            self.polygons.append(Polygon(t.v, t.edges))
+        # The triangles are used as the initial polygons directly, only merged polygons are newly created
+        self.polygons = list(triangles)
 
         self.decompose()
         return len(self.polygons)
 
-
     def decompose(self):
         # For every triangle:
         t1 = 0
@@ -97,25 +157,25 @@ class HertelMehlhorn:
             isPolygonCreated = False
             for i11 in range(polygon1.getNumPoints()):
                 # Set d1 and d2 to first two points of the triangle
-                d1 = polygon1.getPoint(i11)
+                d1 = polygon1.idx[i11]
                 i12 = (i11 + 1) % (polygon1.getNumPoints())
-                d2 = polygon1.getPoint(i12)
+                d2 = polygon1.idx[i12]
 
                 isDiagonal = False
 
                 # For every second triangle
                 for polygon2 in self.polygons:
-                    if polygon1 == polygon2:
+                    if polygon1 == polygon2 or d2 not in polygon2.idx:
                         continue
 
                     # If the two triangles share two neighbouring points, isDiagonal is true
                     # so if i11 = i22 and i12 = i21
                     for i21 in range(polygon2.getNumPoints()):
-                        if (d2.x != polygon2.getPoint(i21).x) or (d2.y != polygon2.getPoint(i21).y):
+                        if d2 != polygon2.idx[i21]:
                             continue
           
                         i22 = (i21 + 1) % (polygon2.getNumPoints())
-                        if (d1.x != polygon2.getPoint(i22).x) or (d1.y != polygon2.getPoint(i22).y):
+                        if d1 != polygon2.idx[i22]:
                             continue
         
                         isDiagonal = True
@@ -170,18 +230,18 @@ class HertelMehlhorn:
       
                 # Now both angles are convex, so removing the diagonal gives a convex polygon
                 # Create new polygon with vertices from poly1 + poly2 without i12 and i11, which are doubles
-                newPolygon = Polygon([], [])
+                newPolygon = Polygon(self.T.table, array('i'))
 
                 # Add points from polygon1 except i11
                 j = i12
                 while j != i11:
-                    newPolygon.v.append(polygon1.getPoint(j))
+                    newPolygon.idx.append(polygon1.idx[j])
                     j = (j + 1) % (polygon1.getNumPoints())
 
                 # Add points from polygon2 except i21
                 j = i22
                 while j != i21:
-                    newPolygon.v.append(polygon2.getPoint(j))
+                    newPolygon.idx.append(polygon2.idx[j])
                     j = (j + 1) % (polygon2.getNumPoints())
 
                 # Replace poly1 and poly2 with newpoly
@@ -196,44 +256,28 @@ class HertelMehlhorn:
 
         self.T.polygons = self.polygons
 
-    def plot(self):
+    def plot(self, filename=None, maxPolygons=None):
         """
         Plot the polygons
+        :param filename: path of the image to export to (.png, .svg, ...), or None to show the plot
+        :param maxPolygons: maximum number of polygons to draw, or None to draw all
         """
-        allPoints = []
-        allPolygons = []
-        for polygon in self.polygons:
-            polygonPoints = []
-            for vertex in polygon.v:
-                allPoints.append(vertex)
-                polygonPoints.append(vertex)
-            polygonPoints.append(polygonPoints[0])
-            allPolygons.append(polygonPoints)
-
-        x_s = [p.x for p in allPoints]
-        y_s = [p.y for p in allPoints]
-
-        fig, ax = plt.subplots()
-        ax.scatter(x_s, y_s)
-        for polygon in allPolygons:
-            x_p = [p.x for p in polygon]
-            y_p = [p.y for p in polygon]
-            ax.fill(x_p, y_p)
-        ax.set_title('Convex Polygon Cover ' + self.T.name)
-        plt.show()
+        coordinates = [np.array([(v.x, v.y) for v in polygon.v], dtype=float) for polygon in self.polygons]
+        render.render(coordinates, 'Convex Polygon Cover ' + self.T.name, filename, maxPolygons)
 
-    def export(self):
-        export = {
+    def solution(self) -> dict:
+        """
+        :return: the polygons in the CGSHOP2023_Solution format
+        """
+        return {
             "type": "CGSHOP2023_Solution",
             "instance": self.T.name,
-            "polygons": []
+            "polygons": [[{'x': v.x, 'y': v.y} for v in polygon.v] for polygon in self.polygons]
         }
 
-        for polygon in self.polygons:
-            export['polygons'].append([{'x': v.x, 'y': v.y} for v in polygon.v])
-
+    def export(self):
         # Serializing json
-        json_object = json.dumps(export, indent=4)
+        json_object = json.dumps(self.solution(), indent=4)
 
         # Writing to sample.json
         with open("hm-" + self.T.name + "-sol" + ".json", "w") as outfile:
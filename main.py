@@ -1,9 +1,15 @@
 import earclipping as e
 import dll as dll
 import hm as hm
+import exact
+import memory
+import os
+from checkpoint import Checkpoint
+from history import RunHistory, instanceHash
+import gc
 import json
 from typing import List
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 def loadJSON(instanceName):
@@ -56,13 +62,12 @@ def linesIntersect(a: dll.Vertex, b: dll.Vertex, c: dll.Vertex, d: dll.Vertex, s
     return dir1 != dir2 and dir3 != dir4
 
 
-def getTriangleData(instanceName, reverseHoles=False):
+def getTriangleData(instance: dict, reverseHoles=False):
     """
     :param reverseHoles:
-    :param instanceName: string
+    :param instance: loaded instance json
     :return: dll.DoublyLinkedList()
     """
-    instance = loadJSON(instanceName)
     verticesDoublyLinkedList = dll.DoublyLinkedList()
 
     outer_boundary = instance["outer_boundary"]
@@ -72,10 +77,11 @@ def getTriangleData(instanceName, reverseHoles=False):
     for idx, v in enumerate(outer_boundary):
         verticesDoublyLinkedList.insertAtEnd(dll.Vertex(v[0], v[1], 0), idx == n - 1)
 
+    # Copy the holes, as holes without bridge candidates are appended again
     if reverseHoles:
         holes = instance["holes"][::-1]
     else:
-        holes = instance["holes"]
+        holes = list(instance["holes"])
 
     # Add holes to the polygon
     for hole in holes:
@@ -238,43 +244,231 @@ def getTriangleData(instanceName, reverseHoles=False):
     return verticesDoublyLinkedList
 
 
-def main(instance_name: str, plot=True, export=True):
-    print(instance_name)
-    timestamp = datetime.now()
-    print('Started creating doubly linked list...')
-    instance_name = instance_name + ".instance"
-    vertices = getTriangleData(instance_name)
-    vertices_reversed_holes = getTriangleData(instance_name, True)
-    print('Created doubly linked list in: ', datetime.now() - timestamp)
-
-    print('Start triangulation...')
-    timestamp = datetime.now()
-    T = e.EarClipping(vertices, instance_name)
-    T_reversed_holes = e.EarClipping(vertices_reversed_holes, instance_name)
-    print('Created triangulation in: ', datetime.now() - timestamp, 'with ', len(T.triangulation), ' triangles')
+# Solver profiles, trading running time for the number of polygons:
+#   holeOrders: for every entry a triangulation is created, with the holes bridged in reversed order if True
+#   orderings: triangle orderings (see hm.ORDERINGS) on which Hertel Mehlhorn is run for every triangulation
+#   restarts: number of perturbed orderings tried around the best ordering afterwards
+#   exact: settings of the exact stage (see exact.improve) run on the best decomposition, or None to skip it
+PROFILES = {
+    'fast': {
+        'holeOrders': [False],
+        'orderings': ['original'],
+        'restarts': 0,
+        'exact': None
+    },
+    'balanced': {
+        'holeOrders': [False, True],
+        'orderings': ['original', 'reversed', 'area', 'area-desc'],
+        'restarts': 0,
+        'exact': None
+    },
+    'best': {
+        'holeOrders': [False, True],
+        'orderings': ['original', 'reversed', 'area', 'area-desc', 'x', 'y'],
+        'restarts': 16,
+        'exact': {
+            'maxPieces': 6,
+            'maxVertices': 16,
+            'maxReflex': 4,
+            'regionTime': 1.0,
+            'totalTime': 60.0
+        }
+    }
+}
+
+
+def solve(instance: dict, name: str, profile='balanced', checkpointPath=None, checkpointInterval=60.0, maxRss=None):
+    """
+    Triangulate the instance and combine the triangles into convex polygons using the given profile
+    :param instance: loaded instance json
+    :param name: name of the instance, used in the solution
+    :param profile: name of the solver profile in PROFILES
+    :param checkpointPath: file to checkpoint the run to, an interrupted run with the same instance and profile
+    is resumed from it. The file is removed once the run has finished
+    :param checkpointInterval: minimum number of seconds between checkpoints during Hertel Mehlhorn
+    :param maxRss: memory budget in kB. If given, the triangulations are freed as soon as they are scored and no
+    further variants (hole orders, orderings) are tried once the resident set size exceeds the budget
+    :return: (HertelMehlhorn, dict with the running time and the number of polygons)
+    """
+    settings = PROFILES[profile]
+    start = datetime.now()
+    memory.resetPeakRss()
+
+    state = None
+    if checkpointPath is not None:
+        state = Checkpoint.load(checkpointPath, instanceHash(instance), profile)
+        if state is None:
+            state = Checkpoint(instanceHash(instance), profile)
+        else:
+            print('Resuming from checkpoint', checkpointPath)
+
+    budgetExceeded = False
+
+    def withinBudget():
+        nonlocal budgetExceeded
+        if maxRss is not None:
+            # Without a way to measure the resident set size, the budget cannot be exceeded
+            rss = memory.currentRss()
+            if rss is not None and rss > maxRss:
+                budgetExceeded = True
+        return not budgetExceeded
+
+    lastCheckpoint = datetime.now()
+
+    def onProgress(result):
+        nonlocal lastCheckpoint
+        if (datetime.now() - lastCheckpoint).total_seconds() >= checkpointInterval:
+            state.setSearch(k, result)
+            state.save(checkpointPath)
+            lastCheckpoint = datetime.now()
+
+    # Run the hole orders one after another, such that only a single doubly linked list and triangulation
+    # are alive besides the best decomposition so far
+    dllTime = triangulationTime = hmTime = timedelta()
+    HM, triangles = None, 0
+    for k, reverseHoles in enumerate(settings['holeOrders']):
+        if HM is not None and not withinBudget():
+            break
+
+        # Triangulation that was finished before the run was interrupted
+        T = None if state is None else state.getTriangulation(k, name)
+        if T is None:
+            timestamp = datetime.now()
+            print('Started creating doubly linked list...')
+            vertices = getTriangleData(instance, reverseHoles)
+            print('Created doubly linked list in: ', datetime.now() - timestamp)
+            dllTime += datetime.now() - timestamp
+
+            print('Start triangulation...')
+            timestamp = datetime.now()
+            T = e.EarClipping(vertices, name)
+            T.release()
+            del vertices
+            print('Created triangulation in: ', datetime.now() - timestamp, 'with ', len(T.triangulation),
+                  ' triangles')
+            triangulationTime += datetime.now() - timestamp
+            if state is not None:
+                state.setTriangulation(k, T)
+                state.save(checkpointPath)
+
+        print('Start Hertel Mehlhorn...')
+        timestamp = datetime.now()
+        if state is None:
+            result = hm.HertelMehlhorn(T, settings['orderings'], settings['restarts'], canContinue=withinBudget)
+        else:
+            result = hm.HertelMehlhorn(T, settings['orderings'], settings['restarts'],
+                                       resume=state.getSearch(k, T), onProgress=onProgress, canContinue=withinBudget)
+            state.setSearch(k, result)
+            state.save(checkpointPath)
+            lastCheckpoint = datetime.now()
+        print('Executed Hertel Mehlhorn in: ', datetime.now() - timestamp, 'resulting in ', len(result.polygons),
+              ' polygons')
+        hmTime += datetime.now() - timestamp
+
+        if HM is None or len(result.polygons) < len(HM.polygons):
+            HM, triangles = result, len(T.triangulation)
+            if maxRss is not None:
+                # Only the decomposition is needed from here on, it refers to the vertex table only
+                HM.bestOrder = None
+                T.release(keepTriangulation=False)
+        del T, result
+        if maxRss is not None:
+            gc.collect()
+
+    if budgetExceeded:
+        print('Memory budget of', maxRss, 'kB exceeded, continuing with the best result so far')
 
-    print('Start Hertel Mehlhorn...')
     timestamp = datetime.now()
-    HM = hm.HertelMehlhorn(T)
-    HM_reversed_holes = hm.HertelMehlhorn(T_reversed_holes)
-    print('Executed Hertel Mehlhorn in: ', datetime.now() - timestamp, 'resulting in ',
-          min(len(HM.polygons), len(HM_reversed_holes.polygons)), ' polygons \n')
+    if settings['exact'] is not None:
+        print('Start exact stage...')
+        HM.polygons = exact.improve(HM.polygons, HM.T.table, **settings['exact'])
+        print('Executed exact stage in: ', datetime.now() - timestamp, 'resulting in ', len(HM.polygons),
+              ' polygons')
+    exactTime = datetime.now() - timestamp
+
+    if state is not None:
+        os.remove(checkpointPath)
+
+    stats = {
+        'profile': profile,
+        'time': (datetime.now() - start).total_seconds(),
+        'timings': {
+            'dll': dllTime.total_seconds(),
+            'triangulation': triangulationTime.total_seconds(),
+            'hm': hmTime.total_seconds(),
+            'exact': exactTime.total_seconds()
+        },
+        'peakMemory': memory.peakRss(),
+        'triangles': triangles,
+        'polygons': len(HM.polygons),
+        'budgetExceeded': budgetExceeded
+    }
+    print('Profile', profile, 'finished in: ', datetime.now() - start, 'resulting in ', stats['polygons'],
+          ' polygons \n')
+
+    return HM, stats
+
+
+def main(instance_name: str, plot=True, export=True, plotFormat=None, maxPolygons=None, profile='balanced',
+         history=None, checkpointPath=None, maxRss=None):
+    """
+    :param instance_name: name of the instance in `instances`
+    :param plot: whether to plot the triangulation and the polygons
+    :param export: whether to export the polygons
+    :param plotFormat: image format (e.g. 'png' or 'svg') to render the plots to, or None to show them
+    :param maxPolygons: maximum number of polygons to draw per plot, or None to draw all
+    :param profile: name of the solver profile in PROFILES
+    :param history: RunHistory to record the run in, if given
+    :param checkpointPath: file to checkpoint the run to and to resume an interrupted run from, if given
+    :param maxRss: memory budget in kB, see solve
+    :return: dict with the running time and the number of polygons
+    """
+    print(instance_name, '(' + profile + ')')
+    instance_name = instance_name + ".instance"
+    instance = loadJSON(instance_name)
+    HM, stats = solve(instance, instance_name, profile, checkpointPath, maxRss=maxRss)
 
-    if len(HM.polygons) > len(HM_reversed_holes.polygons):
-        HM = HM_reversed_holes
+    if history is not None:
+        history.record(instance_name, instance, PROFILES[profile], stats, HM.solution())
 
     if plot:
-        T.plot()
-        HM.plot()
+        # The triangulation is not kept when running with a memory budget
+        plotTriangulation = len(HM.T.triangulation) > 0
+        if plotFormat is None:
+            if plotTriangulation:
+                HM.T.plot(maxPolygons=maxPolygons)
+            HM.plot(maxPolygons=maxPolygons)
+        else:
+            # Render off-screen to image files instead of showing the plots
+            if plotTriangulation:
+                HM.T.plot(instance_name + "-triangulation." + plotFormat, maxPolygons)
+            HM.plot("hm-" + instance_name + "." + plotFormat, maxPolygons)
     if export:
         HM.export()
 
-def run_all():
+    return stats
+
+
+def run_all(profile='balanced', historyPath='history.sqlite', checkpointDir=None, maxRss=None):
+    """
+    :param profile: name of the solver profile in PROFILES
+    :param historyPath: SQLite database to record the runs in
+    :param checkpointDir: directory to keep the checkpoints of unfinished runs in, if given
+    :param maxRss: memory budget in kB per run, see solve
+    """
     instances = ['example_instance1','fpg-poly_0000000020_h1','fpg-poly_0000000020_h2','socg60','maze_79_50_05_005',
              'srpg_octa_mc0000082','srpg_iso_aligned_mc0000088','srpg_iso_mc0000080','ccheese142','srpg_octa_mc0000784',
              'srpg_iso_aligned_mc0001336','maze_4344_250_001_01','ccheese4390','fpg-poly_0000004900_h2','srpg_smo_mc0005962']
+    history = RunHistory(historyPath)
     for i in instances:
-        main(i, plot=False)
+        checkpointPath = None
+        if checkpointDir is not None:
+            os.makedirs(checkpointDir, exist_ok=True)
+            checkpointPath = os.path.join(checkpointDir, i + '-' + profile + '.ckpt')
+        main(i, plot=False, profile=profile, history=history, checkpointPath=checkpointPath, maxRss=maxRss)
+    history.close()
+
 
-# main('srpg_iso_aligned_mc0000088')
-run_all()
+if __name__ == '__main__':
+    # main('srpg_iso_aligned_mc0000088', profile='fast')
+    run_all()
@@ -0,0 +1,58 @@
+import sys
+
+
+def readStatus(field: str):
+    """
+    Read a memory field (in kB) of the current process from /proc/self/status
+    :param field: e.g. 'VmRSS' or 'VmHWM'
+    :return: int or None if it is not available (e.g. not on Linux)
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def currentRss():
+    """
+    :return: current resident set size of the process in kB, or None if it cannot be measured
+    """
+    rss = readStatus('VmRSS')
+    if rss is None:
+        return peakRss()
+    return rss
+
+
+def peakRss():
+    """
+    :return: peak resident set size of the process in kB, since the start or the last resetPeakRss(),
+    or None if it cannot be measured
+    """
+    peak = readStatus('VmHWM')
+    if peak is None:
+        try:
+            # Only available on POSIX systems
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            # macOS reports bytes
+            peak //= 1024
+    return peak
+
+
+def resetPeakRss():
+    """
+    Reset the peak resident set size to the current one, such that the peak of a single run can be measured.
+    Only supported on Linux, elsewhere the peak stays the peak of the whole process
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
@@ -0,0 +1,59 @@
+import math
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+
+
+def downsample(polygons: list, maxPolygons=None) -> list:
+    """
+    Keep an evenly spread subset of at most `maxPolygons` polygons
+    :param polygons: list of (k, 2) coordinate arrays
+    :param maxPolygons: maximum number of polygons to keep, or None to keep all
+    :return: list
+    """
+    if maxPolygons is None or len(polygons) <= maxPolygons:
+        return polygons
+
+    step = math.ceil(len(polygons) / maxPolygons)
+    return polygons[::step]
+
+
+def render(polygons: list, title: str, filename=None, maxPolygons=None, showPoints=True):
+    """
+    Draw all polygons as a single PolyCollection.
+    If `filename` is given the figure is rendered off-screen and written to that file (the format follows
+    from the extension, e.g. .png or .svg), otherwise it is shown in an interactive window
+    :param polygons: list of (k, 2) coordinate arrays, one per polygon
+    :param title: title of the plot
+    :param filename: path of the image to export to, or None to show the plot
+    :param maxPolygons: maximum number of polygons to draw, or None to draw all
+    :param showPoints: whether to draw the vertices of the polygons
+    """
+    shown = downsample(polygons, maxPolygons)
+    if len(shown) < len(polygons):
+        title += ' (%d of %d shown)' % (len(shown), len(polygons))
+
+    if filename is None:
+        fig, ax = plt.subplots()
+    else:
+        # Do not go through pyplot, such that no GUI backend is needed
+        fig = Figure()
+        ax = fig.add_subplot()
+
+    collection = PolyCollection(shown, cmap='tab20', edgecolors='black', linewidths=0.2)
+    collection.set_array(np.arange(len(shown)) % 20)
+    ax.add_collection(collection)
+
+    if showPoints and len(shown) > 0:
+        points = np.concatenate(shown)
+        ax.scatter(points[:, 0], points[:, 1], s=4)
+
+    ax.autoscale_view()
+    ax.set_aspect('equal')
+    ax.set_title(title)
+
+    if filename is None:
+        plt.show()
+    else:
+        fig.savefig(filename)
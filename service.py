@@ -0,0 +1,405 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Local solver service: accepts instances as newline delimited JSON requests on a Unix socket or a localhost port
+# and answers with the CGSHOP2023_Solution, using a pool of worker processes that have already imported the solver.
+#
+# Requests:
+#   {"op": "solve", "id": "job-1", "instance": {...}, "profile": "fast", "timeout": 10}
+#   {"op": "cancel", "id": "job-1"}
+# Responses:
+#   {"id": "job-1", "solution": {...}, "stats": {...}}
+#   {"id": "job-1", "error": "..."}
+
+
+def workerLoop(conn):
+    """
+    Entry point of a worker process: import the solver once and solve the instances sent over `conn`
+    :param conn: end of the pipe to the service
+    """
+    # The solver prints its progress, which is of no use to the clients
+    sys.stdout = open(os.devnull, 'w')
+    import main
+
+    conn.send('ready')
+    while True:
+        try:
+            instance, profile = conn.recv()
+        except EOFError:
+            return
+
+        try:
+            HM, stats = main.solve(instance, instance.get('name', ''), profile)
+            conn.send((True, HM.solution(), stats))
+        except Exception as ex:
+            conn.send((False, repr(ex), None))
+
+
+def validTimeout(timeout) -> bool:
+    """
+    :return: whether `timeout` is a positive, finite number of seconds
+    """
+    return isinstance(timeout, (int, float)) and not isinstance(timeout, bool) and 0 < timeout < math.inf
+
+
+class Worker:
+    def __init__(self, context):
+        """
+        :param context: multiprocessing context to start the process with
+        """
+        self.context = context
+        self.conn = None
+        self.process = None
+        self.start()
+
+    def start(self):
+        """
+        Start a new worker process
+        """
+        self.conn, child = self.context.Pipe()
+        self.process = self.context.Process(target=workerLoop, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self):
+        """
+        Kill the worker process, also when it is in the middle of a job
+        """
+        if self.process.is_alive():
+            self.process.kill()
+        if self.process.pid is not None:
+            self.process.join()
+
+
+class Job:
+    def __init__(self, jobId: str, instance: dict, profile: str, timeout: float, owner=None):
+        """
+        :param jobId: id of the job, used in the response and to cancel the job
+        :param owner: connection that submitted the job, job ids are only unique per connection
+        :param instance: loaded instance json
+        :param profile: name of the solver profile
+        :param timeout: maximum number of seconds the job may take once a worker has picked it up
+        """
+        self.id = jobId
+        self.owner = owner
+        self.instance = instance
+        self.profile = profile
+        self.timeout = timeout
+        self.queued = True
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class SolverService:
+    def __init__(self, workers=None, maxQueue=64, timeout=300.0):
+        """
+        :param workers: number of worker processes, defaults to the number of CPUs
+        :param maxQueue: maximum number of jobs waiting for a worker, further jobs are rejected
+        :param timeout: default maximum number of seconds per job
+        """
+        self.numWorkers = workers or os.cpu_count() or 1
+        self.maxQueue = maxQueue
+        self.timeout = timeout
+        self.queue = None
+        # Number of queued jobs that have not been cancelled, the queue itself also holds the cancelled ones
+        self.pending = 0
+        # (owner, job id) -> Job
+        self.jobs = {}
+        self.workers = []
+        self.dispatchers = []
+        self.counter = itertools.count()
+        self.connections = itertools.count()
+        # Receiving from a worker blocks, so it is done on a thread per worker
+        self.executor = ThreadPoolExecutor(self.numWorkers)
+
+    async def start(self):
+        """
+        Start the worker processes and wait until all of them are warmed up
+        """
+        self.queue = asyncio.Queue()
+        context = multiprocessing.get_context('spawn')
+        self.workers = [Worker(context) for _ in range(self.numWorkers)]
+        await asyncio.gather(*(self.receive(worker) for worker in self.workers))
+        self.dispatchers = [asyncio.create_task(self.dispatch(worker)) for worker in self.workers]
+
+    async def stop(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        for worker in self.workers:
+            worker.stop()
+        self.executor.shutdown(wait=False)
+
+    def receive(self, worker: Worker):
+        return asyncio.get_running_loop().run_in_executor(self.executor, worker.conn.recv)
+
+    def submit(self, instance: dict, profile='balanced', timeout=None, jobId=None, owner=None) -> Job:
+        """
+        Queue an instance to be solved
+        :param instance: loaded instance json
+        :param profile: name of the solver profile
+        :param timeout: maximum number of seconds for the job, defaults to the timeout of the service
+        :param jobId: id of the job, generated if not given
+        :param owner: connection that submits the job
+        :return: Job, of which the future resolves to (solution, stats)
+        :raises asyncio.QueueFull: when the queue is full, the client should retry later
+        """
+        if self.pending >= self.maxQueue:
+            raise asyncio.QueueFull()
+
+        if jobId is None:
+            jobId = 'job-' + str(next(self.counter))
+        job = Job(jobId, instance, profile, timeout or self.timeout, owner)
+
+        self.jobs[(owner, jobId)] = job
+        self.queue.put_nowait(job)
+        self.pending += 1
+        job.future.add_done_callback(lambda _: self.forget(job))
+        return job
+
+    def dequeue(self, job: Job):
+        """
+        Free the slot of a job in the queue, once a worker picks it up or once it is cancelled while queued
+        """
+        if job.queued:
+            job.queued = False
+            self.pending -= 1
+
+    def forget(self, job: Job):
+        self.dequeue(job)
+        if self.jobs.get((job.owner, job.id)) is job:
+            del self.jobs[(job.owner, job.id)]
+
+    def cancel(self, jobId: str, owner=None) -> bool:
+        """
+        Cancel a queued or running job
+        :param jobId: id of the job
+        :param owner: connection that submitted the job
+        :return: whether a job was cancelled
+        """
+        job = self.jobs.get((owner, jobId))
+        if job is None:
+            return False
+        return self.cancelJob(job)
+
+    def cancelJob(self, job: Job) -> bool:
+        if not job.future.cancel():
+            return False
+        # The done callbacks only run later, so free the slot right away for the next submit
+        self.dequeue(job)
+        return True
+
+    async def dispatch(self, worker: Worker):
+        """
+        Feed the jobs in the queue to a single worker
+        :param worker: Worker
+        """
+        while True:
+            job = await self.queue.get()
+            self.dequeue(job)
+            if job.future.done():
+                # Cancelled while it was waiting in the queue
+                continue
+
+            result = None
+            try:
+                try:
+                    worker.conn.send((job.instance, job.profile))
+                except OSError:
+                    # The worker died while it was idle
+                    job.future.set_exception(RuntimeError('worker died'))
+                    await self.replace(worker)
+                    continue
+
+                result = self.receive(worker)
+                await asyncio.wait([result, job.future], timeout=job.timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if result.done() and result.exception() is None:
+                    ok, value, stats = result.result()
+                    if job.future.done():
+                        continue
+                    if ok:
+                        job.future.set_result((value, stats))
+                    else:
+                        job.future.set_exception(RuntimeError(value))
+                    continue
+
+                if not job.future.done():
+                    if result.done():
+                        job.future.set_exception(RuntimeError('worker died'))
+                    else:
+                        job.future.set_exception(asyncio.TimeoutError('timed out after ' + str(job.timeout) + 's'))
+
+                # The worker is still busy with a timed out or cancelled job (or died), so replace it
+                await self.replace(worker, result)
+            except Exception as ex:
+                # Fail the job, but never let the dispatcher die: the queue would not be served by this worker anymore
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError('internal error: ' + repr(ex)))
+                await self.replace(worker, result)
+
+    async def replace(self, worker: Worker, result=None):
+        """
+        Replace a worker by a new, warmed up process, retrying until that succeeds
+        :param worker: Worker
+        :param result: pending receive from the old process, if any
+        """
+        try:
+            worker.stop()
+            if result is not None:
+                await asyncio.wait([result])
+                result.exception()
+        except Exception:
+            pass
+
+        while True:
+            worker.conn.close()
+            try:
+                worker.start()
+                if await self.receive(worker) == 'ready':
+                    return
+            except Exception:
+                # E.g. out of memory or processes, do not let the dispatcher die on it
+                pass
+            worker.stop()
+            await asyncio.sleep(1.0)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve the requests of a single client connection
+        """
+        jobs = []
+        owner = next(self.connections)
+
+        async def respond(response: dict):
+            if writer.is_closing():
+                return
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+        async def respondWhenDone(job: Job):
+            try:
+                solution, stats = await job.future
+                await respond({'id': job.id, 'solution': solution, 'stats': stats})
+            except asyncio.CancelledError:
+                await respond({'id': job.id, 'error': 'cancelled'})
+            except Exception as ex:
+                await respond({'id': job.id, 'error': str(ex)})
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await respond({'error': 'invalid json'})
+                    continue
+
+                if not isinstance(request, dict):
+                    await respond({'error': 'invalid request'})
+                    continue
+
+                jobId = request.get('id')
+                if jobId is not None and not isinstance(jobId, str):
+                    await respond({'error': 'invalid id'})
+                    continue
+
+                if request.get('op') == 'cancel':
+                    self.cancel(jobId, owner)
+                    continue
+
+                if (owner, jobId) in self.jobs:
+                    await respond({'id': jobId, 'error': 'duplicate id'})
+                    continue
+
+                if not isinstance(request.get('instance'), dict):
+                    await respond({'id': jobId, 'error': 'missing instance'})
+                    continue
+
+                timeout = request.get('timeout')
+                if timeout is not None and not validTimeout(timeout):
+                    await respond({'id': jobId, 'error': 'invalid timeout'})
+                    continue
+
+                try:
+                    job = self.submit(request['instance'], request.get('profile', 'balanced'), timeout, jobId, owner)
+                except asyncio.QueueFull:
+                    await respond({'id': jobId, 'error': 'queue full'})
+                    continue
+
+                jobs.append(job)
+                asyncio.create_task(respondWhenDone(job))
+        except ConnectionError:
+            pass
+        finally:
+            # The client is gone, so its unfinished jobs are of no use anymore
+            for job in jobs:
+                self.cancelJob(job)
+            writer.close()
+
+    async def serve(self, path=None, port=None):
+        """
+        Start the workers and serve requests until cancelled
+        :param path: path of the Unix socket to listen on
+        :param port: localhost port to listen on, if no path is given
+        """
+        await self.start()
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, '127.0.0.1', port)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def request(instance: dict, profile='balanced', path=None, port=None, timeout=None) -> dict:
+    """
+    Solve a single instance using a running service
+    :param instance: loaded instance json
+    :param profile: name of the solver profile
+    :param path: path of the Unix socket of the service
+    :param port: localhost port of the service, if no path is given
+    :param timeout: maximum number of seconds for the job
+    :return: response of the service
+    """
+    if path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    else:
+        connection = socket.create_connection(('127.0.0.1', port))
+
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps({'op': 'solve', 'instance': instance, 'profile': profile,
+                                 'timeout': timeout}).encode() + b'\n')
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local convex polygon coverage solver service')
+    parser.add_argument('--socket', help='path of the Unix socket to listen on')
+    parser.add_argument('--port', type=int, default=8023, help='localhost port to listen on if no socket is given')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--queue', type=int, default=64, help='maximum number of waiting jobs')
+    parser.add_argument('--timeout', type=float, default=300.0, help='default maximum number of seconds per job')
+    args = parser.parse_args()
+
+    service = SolverService(args.workers, args.queue, args.timeout)
+    try:
+        asyncio.run(service.serve(args.socket, args.port))
+    except KeyboardInterrupt:
+        pass